@@ -1,8 +1,15 @@
 import os
+import asyncio
+import functools
 import logging
 import sqlite3
 import re
 import sys
+
+import aiosqlite
+import numpy as np
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime
 from telegram import (
     Update,
@@ -42,7 +49,6 @@ try:
     ADMIN_USER_ID = int(os.getenv('ADMIN_USER_ID'))
     BOT_USERNAME = os.getenv('BOT_USERNAME')
     DB_FILE = "filmzy_bot.db"
-    CACHE_REFRESH_INTERVAL = 300  # 5 minutes
 
     # Validate configuration
     if not TOKEN or TOKEN == "your_actual_bot_token_here":
@@ -60,7 +66,7 @@ try:
             logging.FileHandler("filmzy_bot.log")
         ]
     )
-    logger = logging.getLogger(name)
+    logger = logging.getLogger(__name__)
     logger.info("Starting bot with configuration validated")
 
     # Conversation states
@@ -80,6 +86,10 @@ try:
             conn = sqlite3.connect(DB_FILE)
             c = conn.cursor()
 
+            # Run the whole DDL + seed sequence as one transaction so a single
+            # commit (and a single fsync) covers it
+            c.execute("BEGIN")
+
             # Create movies table
             c.execute('''CREATE TABLE IF NOT EXISTS movies (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -115,17 +125,47 @@ try:
                         is_admin BOOLEAN DEFAULT 0
                     )''')
 
+            # Full-text index over movie titles; the trigram tokenizer gives
+            # case-insensitive substring matching like the old Python scan,
+            # but served from an inverted index
+            fts_exists = c.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'movies_fts'"
+            ).fetchone()
+            c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+                        title,
+                        content='movies',
+                        content_rowid='id',
+                        tokenize='trigram'
+                    )''')
+            c.execute('''CREATE TRIGGER IF NOT EXISTS movies_fts_insert
+                    AFTER INSERT ON movies BEGIN
+                        INSERT INTO movies_fts (rowid, title) VALUES (new.id, new.title);
+                    END''')
+            c.execute('''CREATE TRIGGER IF NOT EXISTS movies_fts_delete
+                    AFTER DELETE ON movies BEGIN
+                        INSERT INTO movies_fts (movies_fts, rowid, title)
+                        VALUES ('delete', old.id, old.title);
+                    END''')
+            c.execute('''CREATE TRIGGER IF NOT EXISTS movies_fts_update
+                    AFTER UPDATE OF title ON movies BEGIN
+                        INSERT INTO movies_fts (movies_fts, rowid, title)
+                        VALUES ('delete', old.id, old.title);
+                        INSERT INTO movies_fts (rowid, title) VALUES (new.id, new.title);
+                    END''')
+            if not fts_exists:
+                # Backfill the index from rows inserted before it existed
+                c.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+
             # Insert default categories
             default_categories = [
                 "Anime", "Animation", "Action", "Horror",
                 "Comedy", "Drama", "Sci-Fi", "Fantasy",
                 "Thriller", "Documentary", "Other"
             ]
-            for category in default_categories:
-                try:
-                    c.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
-                except sqlite3.IntegrityError:
-                    pass
+            c.executemany(
+                "INSERT OR IGNORE INTO categories (name) VALUES (?)",
+                [(category,) for category in default_categories]
+            )
 
             # Add new columns if missing
             c.execute("PRAGMA table_info(movies)")
@@ -142,17 +182,35 @@ try:
             if 'media_type' not in columns:
                 c.execute("ALTER TABLE series ADD COLUMN media_type TEXT")
 
+            # Indexes for the hot lookups: updates/deletes filter on
+            # message_id, duplicate detection groups on title, and the
+            # category listing filters on category
+            c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_movies_message_id ON movies (message_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_movies_title ON movies (title)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_movies_category ON movies (category)")
+            c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_series_message_id ON series (message_id)")
+
             # Add current admin to users table
+            c.execute(
+                "INSERT OR IGNORE INTO users (user_id, is_admin) VALUES (?, ?)",
+                (ADMIN_USER_ID, 1)
+            )
+
+            conn.commit()
+
+            # Reject duplicate titles at insert time instead of scanning for
+            # them afterwards. A pre-existing library may already hold
+            # duplicates, in which case the index can't be built until the
+            # admin cleans them up via Find Duplicates.
             try:
                 c.execute(
-                    "INSERT OR IGNORE INTO users (user_id, is_admin) VALUES (?, ?)",
-                    (ADMIN_USER_ID, 1)
+                    "CREATE UNIQUE INDEX IF NOT EXISTS idx_movies_title_unique "
+                    "ON movies (title COLLATE NOCASE)"
                 )
                 conn.commit()
-            except sqlite3.Error as e:
-                logger.error(f"Error adding admin to users: {e}")
+            except sqlite3.IntegrityError as e:
+                logger.warning(f"Duplicate titles present; unique title index not created: {e}")
 
-            conn.commit()
             logger.info("Database initialized successfully")
             return True
         except sqlite3.Error as e:
@@ -167,39 +225,230 @@ try:
         logger.critical("Database initialization failed! Exiting...")
         sys.exit(1)
 
-    # Movie cache with auto-refresh
+    # Shared async connection reused by every helper - opening/closing a
+    # connection per query costs far more than the one-row queries themselves,
+    # and synchronous sqlite3 calls would block the whole event loop.
+    # Opened in open_db() once the application starts its event loop.
+    DB_CONN = None
+
+    # Handles for the periodic maintenance tasks, cancelled in close_db()
+    BACKGROUND_TASKS = []
+
+    DB_PRAGMAS = (
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-40000",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA busy_timeout=30000",
+        "PRAGMA wal_autocheckpoint=1000"
+    )
+
+    async def open_db(application):
+        """Open the shared database connection and warm the movie cache"""
+        global DB_CONN
+        DB_CONN = await aiosqlite.connect(DB_FILE, isolation_level=None)
+        DB_CONN.row_factory = aiosqlite.Row
+
+        # WAL halves the fsyncs per commit and lets readers run while a
+        # write is in progress; verify it actually took effect
+        cursor = await DB_CONN.execute("PRAGMA journal_mode=WAL")
+        journal_mode = (await cursor.fetchone())[0]
+        if journal_mode != 'wal':
+            logger.warning(f"Could not enable WAL journal mode (got: {journal_mode})")
+
+        for pragma in DB_PRAGMAS:
+            await DB_CONN.execute(pragma)
+
+        # SQLite's built-in lower() is ASCII-only; register Python's for
+        # non-ASCII titles. Deterministic so it can be used in indexes.
+        await DB_CONN.create_function("py_lower", 1, str.lower, deterministic=True)
+        application.bot_data['db'] = DB_CONN
+        await refresh_movie_cache()
+
+        cursor = await DB_CONN.execute("SELECT user_id FROM users")
+        KNOWN_USERS.update(row['user_id'] for row in await cursor.fetchall())
+
+        await refresh_category_keyboard()
+
+        # asyncio rather than application.create_task: post_init runs before
+        # Application.start(), where PTB warns about tasks it won't await.
+        # The handles are kept so close_db can cancel the while-True loops.
+        BACKGROUND_TASKS.append(asyncio.create_task(periodic_cache_refresh()))
+        BACKGROUND_TASKS.append(asyncio.create_task(periodic_user_flush()))
+        logger.info("Database connection opened")
+
+    async def close_db(application):
+        """Stop background tasks and close the shared database connection"""
+        global DB_CONN
+        for task in BACKGROUND_TASKS:
+            task.cancel()
+        await asyncio.gather(*BACKGROUND_TASKS, return_exceptions=True)
+        BACKGROUND_TASKS.clear()
+        if DB_CONN is not None:
+            await flush_pending_users()
+            # Fold the WAL back into the main database file before closing
+            await DB_CONN.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            await DB_CONN.close()
+            DB_CONN = None
+            logger.info("Database connection closed")
+
+    # Cache entries are slotted frozen dataclasses - roughly half the bytes
+    # of the dicts they replace, with fixed attribute offsets instead of
+    # hash lookups
+    @dataclass(slots=True, frozen=True)
+    class Movie:
+        id: int
+        title: str
+        title_lc: str
+        category: str
+        category_lc: str
+        file_id: str | None
+        media_type: str
+
+    def make_movie(title, message_id, category, file_id, media_type):
+        """Build a cache entry, deriving the precomputed lowercase fields"""
+        return Movie(
+            id=message_id,
+            title=title,
+            title_lc=title.lower(),
+            category=category,
+            category_lc=category.lower(),
+            file_id=file_id,
+            media_type=media_type or 'document'
+        )
+
+    # Movie cache kept in sync by the DB writers, plus lookup indexes so the
+    # hot paths don't have to scan the whole list
     movie_cache = []
+    movie_by_id = {}
+    movies_by_category = defaultdict(list)
     last_cache_refresh = datetime.min
 
-    def refresh_movie_cache():
+    # Columnar mirror of the cache for scans: one vectorized substring pass
+    # over a string array beats a Python loop over dicts
+    cache_titles_lc = np.empty(0, dtype=np.str_)
+    cache_ids = np.empty(0, dtype=np.int64)
+
+    def rebuild_columnar_cache():
+        """Rebuild the parallel title/id arrays used by the vectorized scan"""
+        global cache_titles_lc, cache_ids
+        cache_titles_lc = np.array([movie.title_lc for movie in movie_cache], dtype=np.str_)
+        cache_ids = np.array([movie.id for movie in movie_cache], dtype=np.int64)
+
+    async def refresh_movie_cache():
         """Refresh movie cache from database"""
-        global movie_cache, last_cache_refresh
+        global movie_cache, movie_by_id, movies_by_category, last_cache_refresh
         try:
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute("SELECT title, message_id, category, file_id, media_type FROM movies")
-            rows = c.fetchall()
-            movie_cache = [
-                {
-                    'title': row[0],
-                    'id': row[1],
-                    'category': row[2],
-                    'file_id': row[3],
-                    'media_type': row[4] or 'document'
-                } for row in rows
-            ]
-            last_cache_refresh = datetime.now()
+            async with _refresh_lock:
+                # Case-folding and the media_type default happen in SQLite's
+                # C code, one pass per row, so Python receives finished values
+                cursor = await DB_CONN.execute(
+                    '''SELECT title, py_lower(title) AS title_lc, message_id,
+                              category, py_lower(category) AS category_lc,
+                              file_id, COALESCE(media_type, 'document') AS media_type
+                       FROM movies'''
+                )
+                rows = await cursor.fetchall()
+                movie_cache = [
+                    Movie(
+                        id=row['message_id'],
+                        title=row['title'],
+                        title_lc=row['title_lc'],
+                        category=row['category'],
+                        category_lc=row['category_lc'],
+                        file_id=row['file_id'],
+                        media_type=row['media_type']
+                    ) for row in rows
+                ]
+                movie_by_id = {movie.id: movie for movie in movie_cache}
+                movies_by_category = defaultdict(list)
+                for movie in movie_cache:
+                    movies_by_category[movie.category_lc].append(movie)
+                last_cache_refresh = datetime.now()
+                rebuild_columnar_cache()
+                build_inline_results.cache_clear()
             logger.info(f"Refreshed movie cache with {len(movie_cache)} movies")
             return True
         except sqlite3.Error as e:
             logger.error(f"Cache refresh error: {e}")
             return False
-        finally:
-            if 'conn' in locals():
-                conn.close()
 
-    # Initial cache load
-    refresh_movie_cache()
+    _refresh_lock = asyncio.Lock()
+
+    def cache_put_movie(title, message_id, category, file_id, media_type):
+        """Insert or replace one movie in the cache and its indexes
+
+        The DB writers call this after committing, so readers never need to
+        poll the database for freshness.
+        """
+        cache_remove_movie(message_id)
+        movie = make_movie(title, message_id, category, file_id, media_type)
+        movie_cache.append(movie)
+        movie_by_id[message_id] = movie
+        movies_by_category[movie.category_lc].append(movie)
+        rebuild_columnar_cache()
+        build_inline_results.cache_clear()
+
+    def cache_remove_movie(message_id):
+        """Drop one movie from the cache and its indexes"""
+        movie = movie_by_id.pop(message_id, None)
+        if movie is None:
+            return None
+        movie_cache.remove(movie)
+        bucket = movies_by_category.get(movie.category_lc)
+        if bucket:
+            bucket.remove(movie)
+            if not bucket:
+                del movies_by_category[movie.category_lc]
+        rebuild_columnar_cache()
+        build_inline_results.cache_clear()
+        return movie
+
+    # Writers keep the cache fresh, so a full refresh is only a safety net
+    # against a missed incremental update
+    CACHE_FULL_REFRESH_INTERVAL = 3600
+
+    async def periodic_cache_refresh():
+        """Defensive hourly full refresh of the movie cache"""
+        while True:
+            await asyncio.sleep(CACHE_FULL_REFRESH_INTERVAL)
+            await refresh_movie_cache()
+
+    # /start dedupe: returning users never touch the users table; new ones
+    # are batched here and flushed in one write every few seconds
+    KNOWN_USERS = set()
+    PENDING_USERS = []
+    USER_FLUSH_INTERVAL = 5  # seconds
+
+    async def flush_pending_users():
+        """Write batched new users in a single executemany/commit"""
+        global PENDING_USERS
+        if not PENDING_USERS:
+            return
+        batch, PENDING_USERS = PENDING_USERS, []
+        try:
+            # The connection runs in autocommit, so without an explicit
+            # transaction each row of the batch would commit on its own
+            await DB_CONN.execute("BEGIN IMMEDIATE")
+            try:
+                await DB_CONN.executemany(
+                    "INSERT OR IGNORE INTO users (user_id, username, first_name, last_name) VALUES (?, ?, ?, ?)",
+                    batch
+                )
+                await DB_CONN.execute("COMMIT")
+            except sqlite3.Error:
+                await DB_CONN.execute("ROLLBACK")
+                raise
+            logger.info(f"Flushed {len(batch)} new users to DB")
+        except sqlite3.Error as e:
+            logger.error(f"User flush error: {e}")
+            PENDING_USERS = batch + PENDING_USERS
+
+    async def periodic_user_flush():
+        """Flush newly seen users to the database every few seconds"""
+        while True:
+            await asyncio.sleep(USER_FLUSH_INTERVAL)
+            await flush_pending_users()
 
 except Exception as config_error:
     logging.critical(f"CONFIGURATION ERROR: {config_error}")
@@ -209,347 +458,414 @@ except Exception as config_error:
 # ==============================================================================
 # SECTION 2: HELPER FUNCTIONS
 # ==============================================================================
-def get_main_menu_keyboard(user_id: int):
-    """Create main menu keyboard with admin buttons"""
-    buttons = [
-        [InlineKeyboardButton("🎞️ List Movies", callback_data='list_all')],
-        [InlineKeyboardButton("📂 Categories", callback_data='show_categories')],
-        [InlineKeyboardButton("🔍 Inline Search", switch_inline_query_current_chat="")]
-    ]
+# Static keyboards never change, so build them once at import time instead of
+# reallocating the same button objects on every callback
+_MAIN_MENU_BUTTONS = [
+    [InlineKeyboardButton("🎞️ List Movies", callback_data='list_all')],
+    [InlineKeyboardButton("📂 Categories", callback_data='show_categories')],
+    [InlineKeyboardButton("🔍 Inline Search", switch_inline_query_current_chat="")]
+]
+
+MAIN_MENU_KB_USER = InlineKeyboardMarkup(_MAIN_MENU_BUTTONS)
+MAIN_MENU_KB_ADMIN = InlineKeyboardMarkup(_MAIN_MENU_BUTTONS + [
+    [InlineKeyboardButton("⚙️ Admin Panel", callback_data='admin_panel')],
+    [InlineKeyboardButton("🔄 Refresh Cache", callback_data='refresh_cache')]
+])
 
-    # Admin-only buttons
-    if user_id == ADMIN_USER_ID:
-        buttons.append([InlineKeyboardButton("⚙️ Admin Panel", callback_data='admin_panel')])
-        buttons.append([InlineKeyboardButton("🔄 Refresh Cache", callback_data='refresh_cache')])
+def get_main_menu_keyboard(user_id: int):
+    """Get main menu keyboard, with the admin variant for the admin user"""
+    return MAIN_MENU_KB_ADMIN if user_id == ADMIN_USER_ID else MAIN_MENU_KB_USER
 
-    return InlineKeyboardMarkup(buttons)
+# Categories change only when add_movie_to_db sees a new one, so the list
+# and its keyboard are cached and rebuilt on that write (and at startup)
+CATEGORIES = []
+CATEGORY_KB = None
 
-def get_category_keyboard():
-    """Get category selection keyboard"""
+async def refresh_category_keyboard():
+    """Rebuild the cached category list and keyboard from the database"""
+    global CATEGORIES, CATEGORY_KB
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT name FROM categories ORDER BY name")
-        categories = [row[0] for row in c.fetchall()]
+        cursor = await DB_CONN.execute("SELECT name FROM categories ORDER BY name")
+        CATEGORIES = [row['name'] for row in await cursor.fetchall()]
 
         keyboard = [
             [InlineKeyboardButton(cat, callback_data=f'cat_{cat}')]
-            for cat in categories
+            for cat in CATEGORIES
         ]
         keyboard.append([InlineKeyboardButton("🏠 Main Menu", callback_data='main_menu')])
-        return InlineKeyboardMarkup(keyboard)
+        CATEGORY_KB = InlineKeyboardMarkup(keyboard)
     except sqlite3.Error as e:
         logger.error(f"Category keyboard error: {e}")
+
+def get_category_keyboard():
+    """Get the cached category selection keyboard"""
+    if CATEGORY_KB is None:
         return InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Main Menu", callback_data='main_menu')]])
-    finally:
-        if 'conn' in locals():
-            conn.close()
+    return CATEGORY_KB
+
+UPLOAD_TYPE_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎬 Movie", callback_data='upload_type_movie')],
+    [InlineKeyboardButton("📺 Series", callback_data='upload_type_series')],
+    [InlineKeyboardButton("❌ Cancel", callback_data='cancel_upload')]
+])
+
+ADMIN_PANEL_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎬 Movie Tools", callback_data='movie_tools')],
+    [InlineKeyboardButton("📺 Series Tools", callback_data='series_tools')],
+    [InlineKeyboardButton("📊 Statistics", callback_data='admin_stats')],
+    [InlineKeyboardButton("🔄 Refresh Cache", callback_data='refresh_cache')],
+    [InlineKeyboardButton("👤 User Management", callback_data='user_management')],
+    [InlineKeyboardButton("🚫 Close Panel", callback_data='admin_close')]
+])
+
+MOVIE_TOOLS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✏️ Edit Movie", callback_data='edit_movie')],
+    [InlineKeyboardButton("🗑️ Delete Movie", callback_data='delete_movie')],
+    [InlineKeyboardButton("🔍 Find Duplicates", callback_data='find_duplicates')],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_back')]
+])
+
+SERIES_TOOLS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✏️ Edit Series", callback_data='edit_series')],
+    [InlineKeyboardButton("🗑️ Delete Series", callback_data='delete_series')],
+    [InlineKeyboardButton("🔍 List All Series", callback_data='list_series')],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_back')]
+])
+
+USER_MANAGEMENT_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("👥 List Users", callback_data='list_users')],
+    [InlineKeyboardButton("👑 Add Admin", callback_data='add_admin')],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_back')]
+])
+
+CONFIRMATION_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Yes, Delete", callback_data='confirm_delete')],
+    [InlineKeyboardButton("❌ Cancel", callback_data='cancel_delete')]
+])
 
 def get_upload_type_keyboard():
     """Get upload type selection keyboard"""
-    keyboard = [
-        [InlineKeyboardButton("🎬 Movie", callback_data='upload_type_movie')],
-        [InlineKeyboardButton("📺 Series", callback_data='upload_type_series')],
-        [InlineKeyboardButton("❌ Cancel", callback_data='cancel_upload')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return UPLOAD_TYPE_KB
 
 def get_admin_panel_keyboard():
     """Get admin panel keyboard"""
-    keyboard = [
-        [InlineKeyboardButton("🎬 Movie Tools", callback_data='movie_tools')],
-        [InlineKeyboardButton("📺 Series Tools", callback_data='series_tools')],
-        [InlineKeyboardButton("📊 Statistics", callback_data='admin_stats')],
-        [InlineKeyboardButton("🔄 Refresh Cache", callback_data='refresh_cache')],
-        [InlineKeyboardButton("👤 User Management", callback_data='user_management')],
-        [InlineKeyboardButton("🚫 Close Panel", callback_data='admin_close')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return ADMIN_PANEL_KB
 
 def get_movie_tools_keyboard():
     """Get movie tools keyboard"""
-    keyboard = [
-        [InlineKeyboardButton("✏️ Edit Movie", callback_data='edit_movie')],
-        [InlineKeyboardButton("🗑️ Delete Movie", callback_data='delete_movie')],
-        [InlineKeyboardButton("🔍 Find Duplicates", callback_data='find_duplicates')],
-        [InlineKeyboardButton("🔙 Back", callback_data='admin_back')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return MOVIE_TOOLS_KB
 
 def get_series_tools_keyboard():
     """Get series tools keyboard"""
-    keyboard = [
-        [InlineKeyboardButton("✏️ Edit Series", callback_data='edit_series')],
-        [InlineKeyboardButton("🗑️ Delete Series", callback_data='delete_series')],
-        [InlineKeyboardButton("🔍 List All Series", callback_data='list_series')],
-        [InlineKeyboardButton("🔙 Back", callback_data='admin_back')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return SERIES_TOOLS_KB
 
 def get_user_management_keyboard():
     """Get user management keyboard"""
-    keyboard = [
-        [InlineKeyboardButton("👥 List Users", callback_data='list_users')],
-        [InlineKeyboardButton("👑 Add Admin", callback_data='add_admin')],
-        [InlineKeyboardButton("🔙 Back", callback_data='admin_back')]
-    ]
-    return InlineKeyboardMarkup(keyboard)def get_confirmation_keyboard():
+    return USER_MANAGEMENT_KB
+
+def get_confirmation_keyboard():
     """Get confirmation keyboard for deletions"""
-    keyboard = [
-        [InlineKeyboardButton("✅ Yes, Delete", callback_data='confirm_delete')],
-        [InlineKeyboardButton("❌ Cancel", callback_data='cancel_delete')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return CONFIRMATION_KB
+
+MIN_FTS_TERM_LEN = 3  # the trigram tokenizer cannot match shorter tokens
+
+SEARCH_STOPWORDS = frozenset({'the', 'a', 'an', 'of', 'and'})
+
+def normalize_search_terms(query_lc):
+    """Dedupe query tokens and drop stopwords and single characters
+
+    Longest terms come first so the rarest tokens match (and short-circuit)
+    early. If filtering would leave nothing, the raw tokens are kept so a
+    query like 'the' still matches something.
+    """
+    terms = {
+        term for term in query_lc.split()
+        if len(term) >= 2 and term not in SEARCH_STOPWORDS
+    }
+    if not terms:
+        terms = set(query_lc.split())
+    return tuple(sorted(terms, key=len, reverse=True))
+
+def scan_cached_titles(search_terms, limit=50):
+    """Vectorized substring scan over the columnar title array
+
+    One np.char.find pass per term replaces the Python-level loop over
+    cache dicts; any-term-matches semantics are preserved.
+    """
+    if cache_ids.size == 0:
+        return []
+    mask = np.zeros(len(cache_titles_lc), dtype=bool)
+    for term in search_terms:
+        mask |= np.char.find(cache_titles_lc, term) >= 0
+    hits = cache_ids[mask][:limit]
+    return [movie_by_id[movie_id] for movie_id in hits.tolist()]
+
+async def search_movies(query: str, limit: int = 50):
+    """Search movie titles, preferring the FTS index over a cache scan"""
+    search_terms = normalize_search_terms(query.lower())
+
+    if search_terms and all(len(term) >= MIN_FTS_TERM_LEN for term in search_terms):
+        match = ' OR '.join('"%s"' % term.replace('"', '""') for term in search_terms)
+        try:
+            cursor = await DB_CONN.execute(
+                '''SELECT m.message_id FROM movies_fts f
+                   JOIN movies m ON m.id = f.rowid
+                   WHERE movies_fts MATCH ? LIMIT ?''',
+                (match, limit)
+            )
+            rows = await cursor.fetchall()
+            return [
+                movie_by_id[row['message_id']]
+                for row in rows if row['message_id'] in movie_by_id
+            ]
+        except sqlite3.Error as e:
+            logger.error(f"FTS search error: {e}")
+
+    # Fallback scan for tokens too short for the trigram index (or FTS errors)
+    return scan_cached_titles(search_terms, limit)
+
+# Cap on parallel sends so gathered fan-outs stay inside Telegram flood limits
+SEND_SEMAPHORE = asyncio.Semaphore(4)
 
 async def send_movie_to_user(context: CallbackContext, user_id: int, movie_id: int, chat_id: int = None):
     """Send movie to user with error handling"""
-    try:
-        # Find movie in cache
-        movie = next((m for m in movie_cache if m['id'] == movie_id), None)
+    async with SEND_SEMAPHORE:
+        try:
+            # Find movie in cache
+            movie = movie_by_id.get(movie_id)
 
-        if not movie:
-            logger.error(f"Movie {movie_id} not found in cache")
-            return False
+            if not movie:
+                logger.error(f"Movie {movie_id} not found in cache")
+                return False
 
-        # Try to send using file_id
-        if movie.get('file_id'):
+            # Try to send using file_id
+            if movie.file_id:
+                try:
+                    if movie.media_type == 'video':
+                        await context.bot.send_video(
+                            chat_id=user_id,
+                            video=movie.file_id,
+                            caption=f"🎬 {movie.title} ({movie.category})"
+                        )
+                    else:
+                        await context.bot.send_document(
+                            chat_id=user_id,
+                            document=movie.file_id,
+                            caption=f"🎬 {movie.title} ({movie.category})"
+                        )
+                    logger.info(f"Sent movie {movie_id} to user {user_id} via file_id")
+                    return True
+                except Exception as e:
+                    logger.warning(f"File_id send failed: {e}. Falling back to forwarding")
+            else:
+                # Every movie should carry a file_id; forwarding is 5-10x
+                # slower and burns storage-channel quota
+                logger.warning(f"Movie {movie_id} has no cached file_id; forwarding once to backfill")
+
+            # Error recovery: forward from the storage channel, then re-cache
+            # the fresh file_id so the next send takes the fast path again
             try:
-                if movie['media_type'] == 'video':
-                    await context.bot.send_video(
-                        chat_id=user_id,
-                        video=movie['file_id'],
-                        caption=f"🎬 {movie['title']} ({movie['category']})"
+                msg = await context.bot.forward_message(
+                    chat_id=user_id,
+                    from_chat_id=STORAGE_CHANNEL_ID,
+                    message_id=movie_id
+                )
+                if msg.video:
+                    await update_movie_in_db(
+                        movie_id, 'file',
+                        {'file_id': msg.video.file_id, 'media_type': 'video'}
                     )
-                else:
-                    await context.bot.send_document(
-                        chat_id=user_id,
-                        document=movie['file_id'],
-                        caption=f"🎬 {movie['title']} ({movie['category']})"
+                elif msg.document:
+                    await update_movie_in_db(
+                        movie_id, 'file',
+                        {'file_id': msg.document.file_id, 'media_type': 'document'}
                     )
-                logger.info(f"Sent movie {movie_id} to user {user_id} via file_id")
+                logger.info(f"Forwarded movie {movie_id} to user {user_id}")
                 return True
-            except Exception as e:
-                logger.warning(f"File_id send failed: {e}. Falling back to forwarding")
-
-        # Fallback to message forwarding
-        try:
-            await context.bot.forward_message(
-                chat_id=user_id,
-                from_chat_id=STORAGE_CHANNEL_ID,
-                message_id=movie_id
-            )
-            logger.info(f"Forwarded movie {movie_id} to user {user_id}")
-            return True
-        except (BadRequest, Forbidden) as e:
-            logger.error(f"Forward error: {str(e)}")
+            except (BadRequest, Forbidden) as e:
+                logger.error(f"Forward error: {str(e)}")
+                if chat_id:
+                    await context.bot.send_message(
+                        chat_id=chat_id,
+                        text="❌ Please start a private chat with me first: "
+                        f"https://t.me/{BOT_USERNAME}"
+                    )
+                return False
+        except Exception as e:
+            logger.error(f"Send movie error: {str(e)}")
             if chat_id:
                 await context.bot.send_message(
                     chat_id=chat_id,
-                    text="❌ Please start a private chat with me first: "
-                    f"https://t.me/{BOT_USERNAME}"
+                    text="❌ Failed to send movie. Please try again later."
                 )
             return False
-    except Exception as e:
-        logger.error(f"Send movie error: {str(e)}")
-        if chat_id:
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="❌ Failed to send movie. Please try again later."
-            )
-        return False
 
-def add_movie_to_db(title: str, message_id: int, category: str, file_id: str = None, media_type: str = 'document'):
-    """Add movie to database"""
+async def add_movie_to_db(title: str, message_id: int, category: str, file_id: str = None, media_type: str = 'document'):
+    """Add movie to database, skipping duplicate titles"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO movies (title, message_id, category, file_id, media_type) VALUES (?, ?, ?, ?, ?)",
+        cursor = await DB_CONN.execute(
+            "INSERT OR IGNORE INTO movies (title, message_id, category, file_id, media_type) VALUES (?, ?, ?, ?, ?)",
             (title, message_id, category, file_id, media_type)
         )
-        conn.commit()
+        if cursor.rowcount == 0:
+            logger.info(f"Skipped duplicate movie title: {title}")
+            return False
 
-        # Add category if not exists
-        c.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
-        conn.commit()
+        # Add category if not exists; a genuinely new one invalidates the
+        # cached keyboard
+        cursor = await DB_CONN.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
+        if cursor.rowcount:
+            await refresh_category_keyboard()
 
+        cache_put_movie(title, message_id, category, file_id, media_type)
         logger.info(f"Added movie to DB: {title} (ID: {message_id}) in {category} as {media_type}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Database insert error: {e}")
         return False
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
-def add_series_to_db(title: str, message_id: int, file_id: str, media_type: str):
+async def add_series_to_db(title: str, message_id: int, file_id: str, media_type: str):
     """Add series to database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute(
+        await DB_CONN.execute(
             "INSERT INTO series (title, message_id, file_id, media_type) VALUES (?, ?, ?, ?)",
             (title, message_id, file_id, media_type)
-        )conn.commit()
+        )
         logger.info(f"Added series to DB: {title} (ID: {message_id}) as {media_type}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Series database insert error: {e}")
         return False
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
-def update_movie_in_db(movie_id: int, field: str, value: str):
+async def update_movie_in_db(movie_id: int, field: str, value: str):
     """Update movie in database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-
         if field == 'title':
-            c.execute("UPDATE movies SET title = ? WHERE message_id = ?", (value, movie_id))
+            await DB_CONN.execute("UPDATE movies SET title = ? WHERE message_id = ?", (value, movie_id))
         elif field == 'category':
-            c.execute("UPDATE movies SET category = ? WHERE message_id = ?", (value, movie_id))
+            await DB_CONN.execute("UPDATE movies SET category = ? WHERE message_id = ?", (value, movie_id))
         elif field == 'file':
-            c.execute("UPDATE movies SET file_id = ?, media_type = ? WHERE message_id = ?",
-                      (value['file_id'], value['media_type'], movie_id))
+            await DB_CONN.execute("UPDATE movies SET file_id = ?, media_type = ? WHERE message_id = ?",
+                                  (value['file_id'], value['media_type'], movie_id))
+
+        movie = movie_by_id.get(movie_id)
+        if movie:
+            if field == 'title':
+                cache_put_movie(value, movie_id, movie.category, movie.file_id, movie.media_type)
+            elif field == 'category':
+                cache_put_movie(movie.title, movie_id, value, movie.file_id, movie.media_type)
+            elif field == 'file':
+                cache_put_movie(movie.title, movie_id, movie.category,
+                                value['file_id'], value['media_type'])
 
-        conn.commit()
         logger.info(f"Updated movie {movie_id}: {field} = {value if field != 'file' else 'FILE'}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Database update error: {e}")
         return False
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
-def delete_movie_from_db(movie_id: int):
+async def delete_movie_from_db(movie_id: int):
     """Delete movie from database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("DELETE FROM movies WHERE message_id = ?", (movie_id,))
-        conn.commit()
+        await DB_CONN.execute("DELETE FROM movies WHERE message_id = ?", (movie_id,))
+        cache_remove_movie(movie_id)
         logger.info(f"Deleted movie from DB: ID {movie_id}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Delete movie error: {e}")
         return False
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
-def delete_series_from_db(series_id: int):
+async def delete_series_from_db(series_id: int):
     """Delete series from database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("DELETE FROM series WHERE message_id = ?", (series_id,))
-        conn.commit()
+        await DB_CONN.execute("DELETE FROM series WHERE message_id = ?", (series_id,))
         logger.info(f"Deleted series from DB: ID {series_id}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Delete series error: {e}")
         return False
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
-def find_duplicate_movies():
+async def find_duplicate_movies():
     """Find duplicate movies in database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute('''
-            SELECT title, COUNT(*) as count
+        # Group case-insensitively to match the NOCASE unique index, so
+        # the legacy duplicates that block that index show up here
+        cursor = await DB_CONN.execute('''
+            SELECT min(title) AS title, COUNT(*) as count
             FROM movies
-            GROUP BY title
+            GROUP BY title COLLATE NOCASE
             HAVING count > 1
         ''')
-        duplicates = c.fetchall()
+        duplicates = await cursor.fetchall()
         return duplicates
     except sqlite3.Error as e:
         logger.error(f"Find duplicates error: {e}")
         return []
 
-def get_bot_statistics():
+async def get_bot_statistics():
     """Get comprehensive bot statistics"""
     stats = {}
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
 
-        # Movie statistics
-        c.execute("SELECT COUNT(*) FROM movies")
-        stats['total_movies'] = c.fetchone()[0]
+    async def scalar(sql):
+        cursor = await DB_CONN.execute(sql)
+        row = await cursor.fetchone()
+        return row[0]
 
-        c.execute("SELECT COUNT(DISTINCT category) FROM movies")
-        stats['total_categories'] = c.fetchone()[0]
+    try:
+        # Movie statistics
+        stats['total_movies'] = await scalar("SELECT COUNT(*) FROM movies")
+        stats['total_categories'] = await scalar("SELECT COUNT(DISTINCT category) FROM movies")
 
         # Series statistics
-        c.execute("SELECT COUNT(*) FROM series")
-        stats['total_series'] = c.fetchone()[0]
+        stats['total_series'] = await scalar("SELECT COUNT(*) FROM series")
 
         # User statistics
-        c.execute("SELECT COUNT(*) FROM users")
-        stats['total_users'] = c.fetchone()[0]
-
-        c.execute("SELECT COUNT(*) FROM users WHERE is_admin = 1")
-        stats['admin_users'] = c.fetchone()[0]
+        stats['total_users'] = await scalar("SELECT COUNT(*) FROM users")
+        stats['admin_users'] = await scalar("SELECT COUNT(*) FROM users WHERE is_admin = 1")
 
         # Recent activity
-        c.execute("SELECT MAX(timestamp) FROM movies")
-        stats['last_movie_added'] = c.fetchone()[0]
-
-        c.execute("SELECT MAX(timestamp) FROM series")
-        stats['last_series_added'] = c.fetchone()[0]
+        stats['last_movie_added'] = await scalar("SELECT MAX(timestamp) FROM movies")
+        stats['last_series_added'] = await scalar("SELECT MAX(timestamp) FROM series")
 
         return stats
     except sqlite3.Error as e:
         logger.error(f"Statistics error: {e}")
-        return {}def get_all_series():
+        return {}
+
+async def get_all_series():
     """Get all series from database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT title, message_id FROM series ORDER BY title")
-        series_list = c.fetchall()
+        cursor = await DB_CONN.execute("SELECT title, message_id FROM series ORDER BY title")
+        series_list = await cursor.fetchall()
         return series_list
     except sqlite3.Error as e:
         logger.error(f"Get series error: {e}")
         return []
 
-def get_all_users():
+async def get_all_users():
     """Get all users from database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT user_id, username, first_name, last_name, is_admin FROM users")
-        users = c.fetchall()
+        cursor = await DB_CONN.execute(
+            "SELECT user_id, username, first_name, last_name, is_admin FROM users"
+        )
+        users = await cursor.fetchall()
         return users
     except sqlite3.Error as e:
         logger.error(f"Get users error: {e}")
         return []
 
-def add_admin_user(user_id: int):
+async def add_admin_user(user_id: int):
     """Add or update user as admin"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute(
+        await DB_CONN.execute(
             "INSERT OR REPLACE INTO users (user_id, is_admin) VALUES (?, ?)",
             (user_id, 1)
         )
-        conn.commit()
         logger.info(f"Added admin user: {user_id}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Add admin error: {e}")
         return False
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
       # ==============================================================================
 # SECTION 3: COMMAND HANDLERS
@@ -560,17 +876,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     user_id = user.id
     
-    # Add user to database
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute(
-            "INSERT OR IGNORE INTO users (user_id, username, first_name, last_name) VALUES (?, ?, ?, ?)",
-            (user_id, user.username, user.first_name, user.last_name)
-        )
-        conn.commit()
-    except sqlite3.Error as e:
-        logger.error(f"User database error: {e}")
+    # Queue new users for the batched flush; returning users skip the DB
+    if user_id not in KNOWN_USERS:
+        KNOWN_USERS.add(user_id)
+        PENDING_USERS.append((user_id, user.username, user.first_name, user.last_name))
     
     welcome_text = (
         "🎬 Welcome to FilmzyZone Bot!\n\n"
@@ -641,7 +950,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
     
     elif data == 'refresh_cache' and user_id == ADMIN_USER_ID:
-        refresh_movie_cache()
+        await refresh_movie_cache()
         await query.edit_message_text(
             "✅ Cache refreshed successfully!",
             reply_markup=get_main_menu_keyboard(user_id)
@@ -667,11 +976,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def show_category_movies(query, category):
     """Show movies in a specific category"""
-    # Refresh cache if needed
-    if (datetime.now() - last_cache_refresh).seconds > CACHE_REFRESH_INTERVAL:refresh_movie_cache()
-    
-    category_movies = [m for m in movie_cache if m['category'].lower() == category.lower()]
-    
+    category_movies = movies_by_category.get(category.lower(), [])
+
     if not category_movies:
         await query.edit_message_text(
             f"❌ No movies found in category: {category}",
@@ -679,7 +985,7 @@ async def show_category_movies(query, category):
         )
         return
     
-    movie_list = "\n".join([f"• {movie['title']}" for movie in category_movies[:20]])
+    movie_list = "\n".join([f"• {movie.title}" for movie in category_movies[:20]])
     
     if len(category_movies) > 20:
         movie_list += f"\n\n... and {len(category_movies) - 20} more movies"
@@ -692,10 +998,6 @@ async def show_category_movies(query, category):
 
 async def list_all_movies(query):
     """List all movies"""
-    # Refresh cache if needed
-    if (datetime.now() - last_cache_refresh).seconds > CACHE_REFRESH_INTERVAL:
-        refresh_movie_cache()
-    
     if not movie_cache:
         await query.edit_message_text(
             "❌ No movies available yet!",
@@ -704,7 +1006,7 @@ async def list_all_movies(query):
         return
     
     total_movies = len(movie_cache)
-    categories = set(movie['category'] for movie in movie_cache)
+    categories = set(movie.category for movie in movie_cache)
     
     await query.edit_message_text(
         f"📊 Movie Library Stats:\n\n"
@@ -718,19 +1020,8 @@ async def list_all_movies(query):
 
 async def search_and_send_movies(update: Update, context: ContextTypes.DEFAULT_TYPE, query: str):
     """Search and send movies to user"""
-    # Refresh cache if needed
-    if (datetime.now() - last_cache_refresh).seconds > CACHE_REFRESH_INTERVAL:
-        refresh_movie_cache()
-    
-    # Search in cache
-    results = []
-    search_terms = query.lower().split()
-    
-    for movie in movie_cache:
-        title_lower = movie['title'].lower()
-        if any(term in title_lower for term in search_terms):
-            results.append(movie)
-    
+    results = await search_movies(query)
+
     if not results:
         await update.message.reply_text(
             f"❌ No movies found for '{query}'",
@@ -741,17 +1032,20 @@ async def search_and_send_movies(update: Update, context: ContextTypes.DEFAULT_T
     # Send results
     await update.message.reply_text(f"🎭 Found {len(results)} movies for '{query}':")
     
-    sent_count = 0
-    for movie in results[:10]:  # Limit to 10 results
-        success = await send_movie_to_user(
-            context, 
-            update.effective_user.id, 
-            movie['id'],
+    # Fan the sends out in parallel; total latency is the slowest send
+    # rather than the sum of all of them
+    sends = [
+        send_movie_to_user(
+            context,
+            update.effective_user.id,
+            movie.id,
             update.effective_chat.id
         )
-        if success:
-            sent_count += 1
-    
+        for movie in results[:10]  # Limit to 10 results
+    ]
+    outcomes = await asyncio.gather(*sends, return_exceptions=True)
+    sent_count = sum(1 for outcome in outcomes if outcome is True)
+
     if sent_count == 0:
         await update.message.reply_text(
             "❌ Could not send any movies. Please start a private chat with me.",
@@ -763,52 +1057,61 @@ async def search_and_send_movies(update: Update, context: ContextTypes.DEFAULT_T
             ]])
         )
 
-async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle inline queries"""
-    query = update.inline_query.query
-    
-    if not query or len(query) < 2:
-        return
-    
-    # Refresh cache if needed
-    if (datetime.now() - last_cache_refresh).seconds > CACHE_REFRESH_INTERVAL:
-        refresh_movie_cache()
-    
-    # Search in cache
-    results = []
-    search_terms = query.lower().split()
-    
-    for movie in movie_cache:
-        title_lower = movie['title'].lower()
-        if any(term in title_lower for term in search_terms):results.append(movie)
-    
-    # Create inline results
+@functools.lru_cache(maxsize=1024)
+def build_inline_results(query_lc: str):
+    """Build inline results for a query, memoized per lowercased query
+
+    Served entirely from the in-memory cache; the DB writers call
+    build_inline_results.cache_clear() whenever the catalog changes.
+    """
+    results = scan_cached_titles(normalize_search_terms(query_lc))  # capped at the Telegram limit of 50
+
     inline_results = []
-    for movie in results[:50]:  # Telegram limit
-        if movie['media_type'] == 'video':
+    for movie in results:
+        if movie.media_type == 'video':
             result = InlineQueryResultCachedVideo(
-                id=str(movie['id']),
-                video_file_id=movie['file_id'],
-                title=movie['title'],
-                caption=f"🎬 {movie['title']} ({movie['category']})",
-                description=f"Category: {movie['category']}"
+                id=str(movie.id),
+                video_file_id=movie.file_id,
+                title=movie.title,
+                caption=f"🎬 {movie.title} ({movie.category})",
+                description=f"Category: {movie.category}"
             )
         else:
             result = InlineQueryResultCachedDocument(
-                id=str(movie['id']),
-                document_file_id=movie['file_id'],
-                title=movie['title'],
-                caption=f"🎬 {movie['title']} ({movie['category']})",
-                description=f"Category: {movie['category']}"
+                id=str(movie.id),
+                document_file_id=movie.file_id,
+                title=movie.title,
+                caption=f"🎬 {movie.title} ({movie.category})",
+                description=f"Category: {movie.category}"
             )
         inline_results.append(result)
-    
-    await update.inline_query.answer(inline_results, cache_time=300)
+    return tuple(inline_results)
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle inline queries"""
+    query = update.inline_query.query
+
+    if not query or len(query) < 2:
+        return
+
+    # Stable result ids + is_personal=False let Telegram cache popular
+    # queries at its edge for all users
+    await update.inline_query.answer(
+        list(build_inline_results(query.lower())),
+        cache_time=300,
+        is_personal=False
+    )
 
 def main():
     """Start the bot"""
     # Create application
-    application = Application.builder().token(TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .post_init(open_db)
+        .post_shutdown(close_db)
+        .build()
+    )
     
     # Add handlers
     application.add_handler(CommandHandler("start", start))
@@ -821,5 +1124,5 @@ def main():
     application.run_polling()
     logger.info("Bot stopped")
 
-if name == 'main':
+if __name__ == '__main__':
     main()